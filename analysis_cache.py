@@ -0,0 +1,261 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from report import analyze_video_results, analyze_audio_results
+
+# On-disk cache of raw analysis metrics, keyed by media content.
+# Ratings from report.py are NOT cached: they are recomputed from the cached
+# metrics, so retuning thresholds only re-scores without decoding again.
+DEFAULT_CACHE_PATH = os.environ.get(
+    "ANALYSIS_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "zoomquality", "analysis.sqlite3")
+)
+# Limit on the summed JSON payload size of the entries (not the file size;
+# SQLite page/index overhead comes on top, freed pages are vacuumed on eviction)
+DEFAULT_MAX_BYTES = int(os.environ.get("ANALYSIS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# LRU timestamps and hit/miss counters are batched in memory and written at
+# most this often, so lookups only need a shared read.
+FLUSH_INTERVAL_SEC = 5.0
+
+def content_hash(path, chunk_size=1024 * 1024):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_key(media_digest, analyzer, version, params=None):
+    """
+    Builds the cache key from the media hash, analyzer name/version and parameters.
+    """
+    params_json = json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+    raw = f"{media_digest}|{analyzer}|{version}|{params_json}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class AnalysisCache:
+    """
+    Size-bounded LRU cache backed by SQLite.
+
+    Every operation opens its own connection, so one cache file can be shared
+    by several threads and processes. Lookups are plain reads (WAL mode lets
+    them run concurrently); only puts and periodic flushes take the write lock.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, flush_interval=FLUSH_INTERVAL_SEC):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            
+        # Pending LRU touches and counters not yet written to the database
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._hits = 0
+        self._misses = 0
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+        
+        with self._connect() as conn:
+            # Must precede table creation to take effect on a new file
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        return contextlib.closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def get(self, key):
+        """
+        Returns the cached metrics for key, or None. Counts a hit or miss.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._touched[key] = time.time()
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def flush(self):
+        """
+        Writes batched LRU timestamps and hit/miss counters to the database.
+        """
+        with self._lock:
+            touched, hits, misses = self._touched, self._hits, self._misses
+            self._touched, self._hits, self._misses = {}, 0, 0
+            self._last_flush = time.monotonic()
+        if not (touched or hits or misses):
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(ts, key) for key, ts in touched.items()],
+            )
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'hits'", (hits,))
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'misses'", (misses,))
+            conn.execute("COMMIT")
+
+    def put(self, key, metrics):
+        """
+        Stores metrics (a JSON-serializable dict) and evicts least recently
+        used entries until the cache fits in max_bytes.
+        """
+        value = json.dumps(metrics, sort_keys=True)
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        # Apply pending LRU touches first so eviction sees them
+        self.flush()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                for old_key, old_size in conn.execute(
+                    "SELECT key, size FROM entries WHERE key != ? ORDER BY last_access", (key,)
+                ).fetchall():
+                    conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    evicted += 1
+                    total -= old_size
+                    if total <= self.max_bytes:
+                        break
+                conn.execute("UPDATE stats SET value = value + ? WHERE name = 'evictions'", (evicted,))
+            conn.execute("COMMIT")
+            if evicted:
+                # Give freed pages back to the filesystem and keep the WAL short
+                conn.execute("PRAGMA incremental_vacuum")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def stats(self):
+        """
+        Returns hit/miss counters (shared across processes) and current size.
+        size_bytes is the payload size that max_bytes limits; file_bytes is
+        the database file on disk.
+        """
+        self.flush()
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = counters['hits'] + counters['misses']
+        return {
+            "hits": counters['hits'],
+            "misses": counters['misses'],
+            "evictions": counters['evictions'],
+            "hit_rate": counters['hits'] / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "file_bytes": os.path.getsize(self.path),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._touched, self._hits, self._misses = {}, 0, 0
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE stats SET value = 0")
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def cached_analysis(cache, media_path, analyzer, version, analyze_fn, params=None, path_field=None):
+    """
+    Returns analyze_fn(media_path, **params), served from cache when the same
+    content was already analyzed with the same analyzer version and params.
+    Error results are not cached. path_field names a result key that holds
+    the media path: it is not cached and is set from media_path instead.
+    """
+    params = params or {}
+    try:
+        digest = content_hash(media_path)
+    except OSError as e:
+        return {"error": f"Could not read {media_path}: {e}"}
+    key = make_key(digest, analyzer, version, params)
+    metrics = cache.get(key)
+    if metrics is None:
+        metrics = analyze_fn(media_path, **params)
+        if "error" in metrics:
+            return metrics
+        metrics = {k: v for k, v in metrics.items() if k != path_field}
+        cache.put(key, metrics)
+    if path_field:
+        metrics[path_field] = media_path
+    return metrics
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Returns the process-wide cache at DEFAULT_CACHE_PATH, created on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache(DEFAULT_CACHE_PATH)
+        return _default_cache
+
+def analyze_audio_cached(audio_path, cache=None):
+    from audio_check import analyze_audio_file, ANALYZER_VERSION
+
+    cache = cache or get_default_cache()
+    return cached_analysis(cache, audio_path, "audio", ANALYZER_VERSION, analyze_audio_file, path_field="audio_path")
+
+def analyze_video_cached(video_path, cache=None, max_frames=300, frame_step=1):
+    from video_check import analyze_video_file, ANALYZER_VERSION
+
+    cache = cache or get_default_cache()
+    params = {"max_frames": max_frames, "frame_step": frame_step}
+    return cached_analysis(cache, video_path, "video", ANALYZER_VERSION, analyze_video_file, params)
+
+def score_file(media_path, cache=None):
+    """
+    Analyzes (or loads cached metrics for) a media file and rates it with
+    the current report.py thresholds. Returns (metrics, rating, recommendations).
+    """
+    ext = os.path.splitext(media_path)[1].lower()
+    if ext == ".wav":
+        metrics = analyze_audio_cached(media_path, cache)
+        rating, recs = analyze_audio_results(metrics)
+    else:
+        metrics = analyze_video_cached(media_path, cache)
+        rating, recs = analyze_video_results(metrics)
+    return metrics, rating, recs
+
+if __name__ == "__main__":
+    # Batch run: python analysis_cache.py file1.wav file2.avi ...
+    cache = get_default_cache()
+    for media_path in sys.argv[1:]:
+        metrics, rating, recs = score_file(media_path, cache)
+        print(f"{media_path}: {rating} {recs}")
+    print(cache.stats())
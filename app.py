@@ -8,8 +8,9 @@ import requests
 from streamlit_webrtc import webrtc_streamer, WebRtcMode, RTCConfiguration
 
 from video_check import VideoProcessor
-from audio_check import AudioRecorder, analyze_audio_file
+from audio_check import AudioRecorder, PlaybackStore, analyze_audio_file
 from network_check import check_network_quality
+from network_monitor import monitor_network_quality, DEFAULT_DURATION_SEC
 from report import analyze_video_results, analyze_audio_results, analyze_network_results
 
 # RTC Configuration (STUN servers)
@@ -17,6 +18,27 @@ RTC_CONFIGURATION = RTCConfiguration(
     {"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]}
 )
 
+# Video analysis execution mode: "inline" (on the webrtc thread) or "pool"
+# (shared-memory worker processes, VIDEO_WORKERS of them)
+VIDEO_ANALYSIS_MODE = os.environ.get("VIDEO_ANALYSIS_MODE", "inline")
+
+def video_processor_factory():
+    if VIDEO_ANALYSIS_MODE == "pool":
+        from video_workers import get_shared_pool
+        return VideoProcessor(pool=get_shared_pool())
+    return VideoProcessor()
+
+# Optional jitter/loss monitoring against an echo server ("host:port")
+NETWORK_MONITOR_TARGET = os.environ.get("NETWORK_MONITOR_TARGET")
+
+# How long the recorded audio clip is kept for playback
+AUDIO_BLOB_TTL_SEC = int(os.environ.get("AUDIO_BLOB_TTL_SEC", 600))
+
+@st.cache_resource
+def get_playback_store():
+    # One store per server process; sessions only hold a key into it
+    return PlaybackStore(ttl=AUDIO_BLOB_TTL_SEC)
+
 st.set_page_config(page_title="Video Call Quality Checker", page_icon="📹", layout="wide")
 
 def get_star_rating(value, min_val, max_val, inverse=False):
@@ -55,6 +77,10 @@ with col_h2:
     location = get_location()
     st.caption(f"📍 Location: {location}")
 
+# Expire clips of idle/abandoned sessions on every script run
+playback_store = get_playback_store()
+playback_store.sweep()
+
 if 'results' not in st.session_state:
     st.session_state.results = {}
 if 'workflow_state' not in st.session_state:
@@ -64,6 +90,7 @@ if 'workflow_state' not in st.session_state:
 with st.sidebar:
     st.header("Control Panel")
     if st.button("Reset / New Check", type="secondary"):
+        playback_store.discard(st.session_state.results.get('audio', {}).get('audio_key'))
         st.session_state.results = {}
         st.session_state.workflow_state = 'idle'
         st.rerun()
@@ -86,7 +113,7 @@ elif st.session_state.workflow_state == 'video':
         key="video-check",
         mode=WebRtcMode.SENDRECV,
         rtc_configuration=RTC_CONFIGURATION,
-        video_processor_factory=VideoProcessor,
+        video_processor_factory=video_processor_factory,
         media_stream_constraints={"video": True, "audio": False},
         async_processing=True,
     )
@@ -125,13 +152,13 @@ elif st.session_state.workflow_state == 'audio':
     
     if st.button("Analyze Recorded Audio", type="primary"):
         if ctx.audio_processor:
-            # Save to file
-            output_file = "recorded_audio.wav"
-            saved_path = ctx.audio_processor.export(output_file)
+            # Encode in memory (no shared file on disk between sessions)
+            wav_bytes, blob, mime = ctx.audio_processor.encode_with_playback()
             
-            if saved_path:
+            if wav_bytes:
                 st.toast("Analyzing Audio...")
-                audio_res = analyze_audio_file(saved_path)
+                audio_res = analyze_audio_file(wav_bytes)
+                audio_res['audio_key'] = playback_store.put(blob, mime)
                 st.session_state.results['audio'] = audio_res
                 st.session_state.workflow_state = 'network'
                 st.rerun()
@@ -147,9 +174,18 @@ elif st.session_state.workflow_state == 'network':
     
     with st.spinner("Testing Download & Upload speeds..."):
         network_res = check_network_quality()
-        st.session_state.results['network'] = network_res
-        st.session_state.workflow_state = 'complete'
-        st.rerun()
+        
+    if NETWORK_MONITOR_TARGET and "error" not in network_res:
+        with st.spinner(f"Monitoring jitter & packet loss for {DEFAULT_DURATION_SEC}s..."):
+            monitor_res = monitor_network_quality(NETWORK_MONITOR_TARGET)
+        if "error" not in monitor_res:
+            # Keep the speedtest ping; add the rolling jitter/loss figures
+            monitor_res.pop("ping_ms", None)
+            network_res.update(monitor_res)
+            
+    st.session_state.results['network'] = network_res
+    st.session_state.workflow_state = 'complete'
+    st.rerun()
 
 # 5. Results / Dashboard
 elif st.session_state.workflow_state == 'complete':
@@ -176,8 +212,8 @@ elif st.session_state.workflow_state == 'complete':
         st.metric("Rating", v_rating)
         st.divider()
         
-        if "last_frame" in v_res:
-             st.image(v_res['last_frame'], caption="Captured Frame")
+        if v_res.get('thumbnail'):
+             st.image(v_res['thumbnail'], caption="Captured Frame")
              
         b_val = v_res.get('avg_brightness', 0)
         s_val = v_res.get('avg_sharpness', 0)
@@ -204,8 +240,12 @@ elif st.session_state.workflow_state == 'complete':
         st.write(f"**Volume:** {get_star_rating(vol_val, -70, -35)} ({vol_val:.1f} dB)")
         st.write(f"**SNR:** {get_star_rating(snr_val, 10, 50)} ({snr_val:.1f} dB)")
         
-        if "audio_path" in a_res:
-             st.audio(a_res['audio_path'])
+        if "audio_key" in a_res:
+             blob, mime = playback_store.get(a_res['audio_key'])
+             if blob:
+                 st.audio(blob, format=mime)
+             else:
+                 st.caption("Recording expired.")
 
     with col3:
         st.subheader("Network")
@@ -223,7 +263,13 @@ elif st.session_state.workflow_state == 'complete':
         st.write(f"**Upload:** {u_val:.1f} Mbps")
         st.write(f"**Ping:** {p_val:.0f} ms")
         
+        if n_res.get('jitter_p95_ms') is not None:
+             st.write(f"**Jitter (p95):** {n_res['jitter_p95_ms']:.1f} ms")
+        if 'loss_pct' in n_res:
+             st.write(f"**Packet Loss:** {n_res['loss_pct']:.1f}% (longest burst: {n_res['max_loss_burst']})")
+        
     st.divider()
     if st.button("Run Again", type="primary"):
+        playback_store.discard(a_res.get('audio_key'))
         st.session_state.workflow_state = 'idle'
         st.rerun()
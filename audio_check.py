@@ -5,6 +5,39 @@ import scipy.io.wavfile as wav
 import av
 import threading
 import io
+import logging
+import time
+import uuid
+
+# Bump when the metric computation changes (invalidates cached analyses)
+ANALYZER_VERSION = 1
+
+# Compact codec used for the playback copy
+PLAYBACK_FORMAT = "ogg"
+PLAYBACK_CODEC = "libopus"
+PLAYBACK_MIME = "audio/ogg"
+
+logger = logging.getLogger(__name__)
+
+def encode_frames(frames, fmt='wav', codec='pcm_s16le'):
+    """
+    Encodes a list of av.AudioFrame in memory and returns the bytes.
+    """
+    output_data = io.BytesIO()
+    container = av.open(output_data, mode='w', format=fmt)
+    stream = container.add_stream(codec, rate=frames[0].rate)
+    stream.layout = str(frames[0].layout.name) # e.g. 'stereo' or 'mono'
+    
+    for frame in frames:
+        for packet in stream.encode(frame):
+            container.mux(packet)
+            
+    # Flush
+    for packet in stream.encode():
+        container.mux(packet)
+        
+    container.close()
+    return output_data.getvalue()
 
 class AudioRecorder:
     def __init__(self):
@@ -16,9 +49,35 @@ class AudioRecorder:
             self.frames.append(frame)
         return frame
         
+    def take_frames(self):
+        """
+        Returns the recorded frames and clears the buffer.
+        """
+        with self.frames_lock:
+            frames = self.frames
+            self.frames = []
+        return frames
+        
+    def encode_with_playback(self):
+        """
+        Encodes the recording once as WAV (for analysis) and once in the
+        compact playback codec. Returns (wav_bytes, playback_bytes, mime);
+        the WAV bytes are reused for playback if the codec is unavailable.
+        """
+        frames = self.take_frames()
+        if not frames:
+            return None, None, None
+            
+        wav_bytes = encode_frames(frames)
+        try:
+            return wav_bytes, encode_frames(frames, PLAYBACK_FORMAT, PLAYBACK_CODEC), PLAYBACK_MIME
+        except Exception as e:
+            logger.warning("%s encoding unavailable (%s), keeping WAV for playback", PLAYBACK_CODEC, e)
+            return wav_bytes, wav_bytes, "audio/wav"
+        
     def export(self, output_path):
         """
-        Exports recorded frames to a WAV file.
+        Exports recorded frames to a WAV file. The buffer is left intact.
         """
         with self.frames_lock:
             frames = self.frames.copy()
@@ -26,37 +85,78 @@ class AudioRecorder:
         if not frames:
             return None
             
-        output_data = io.BytesIO()
-        container = av.open(output_data, mode='w', format='wav')
-        stream = container.add_stream('pcm_s16le', rate=frames[0].rate)
-        stream.layout = str(frames[0].layout.name) # e.g. 'stereo' or 'mono'
-        
-        for frame in frames:
-            for packet in stream.encode(frame):
-                container.mux(packet)
-                
-        # Flush
-        for packet in stream.encode():
-            container.mux(packet)
-            
-        container.close()
-        output_data.seek(0)
-        
         # Write to file
         with open(output_path, 'wb') as f:
-            f.write(output_data.getvalue())
+            f.write(encode_frames(frames))
             
         return output_path
 
+class PlaybackStore:
+    """
+    Server-side store for recorded clips, shared by all sessions.
+    Session state only keeps the key; entries expire after ttl seconds
+    whether or not their session ever renders again.
+    """
+    def __init__(self, ttl=600, sweep_interval=60, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> (expires_at, data, mime)
+        
+        # Background sweep so expiry does not depend on any page rerun
+        # (sweep_interval=None leaves sweeping to put/get/sweep calls)
+        if sweep_interval is not None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True)
+            self._sweeper.start()
+        
+    def _sweep_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.sweep()
+        
+    def put(self, data, mime):
+        key = uuid.uuid4().hex
+        with self.lock:
+            self._sweep()
+            self.entries[key] = (self.clock() + self.ttl, data, mime)
+        return key
+        
+    def get(self, key):
+        """
+        Returns (data, mime), or (None, None) if missing or expired.
+        """
+        with self.lock:
+            self._sweep()
+            entry = self.entries.get(key)
+        if entry is None:
+            return None, None
+        return entry[1], entry[2]
+        
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        
+    def sweep(self):
+        with self.lock:
+            self._sweep()
+        
+    def _sweep(self):
+        now = self.clock()
+        for key in [k for k, (expires_at, _, _) in self.entries.items() if expires_at <= now]:
+            del self.entries[key]
+
 def analyze_audio_file(audio_path):
     """
     Analyzes an audio file (WAV) for quality metrics using scipy.
+    audio_path may be a file path or the WAV bytes themselves.
     """
     try:
+        source = io.BytesIO(audio_path) if isinstance(audio_path, bytes) else audio_path
+        
         # Load audio file using scipy
         # returns (samplerate, data)
         try:
-            samplerate, data = wav.read(audio_path)
+            samplerate, data = wav.read(source)
         except ValueError:
             # Scipy might fail on some wav headers, fallback to wave? 
             # But av usually writes standard wav.
@@ -121,15 +221,17 @@ def analyze_audio_file(audio_path):
             noise_floor_db = -90
             snr_db = 0
             
-        return {
-            "rms_amplitude": rms,
-            "decibels": db,
-            "peak_amplitude": peak,
-            "noise_floor_db": noise_floor_db,
-            "snr_db": snr_db,
-            "audio_path": audio_path,
-            "duration_sec": len(samples) / samplerate
+        results = {
+            "rms_amplitude": float(rms),
+            "decibels": float(db),
+            "peak_amplitude": float(peak),
+            "noise_floor_db": float(noise_floor_db),
+            "snr_db": float(snr_db),
+            "duration_sec": float(len(samples) / samplerate)
         }
+        if isinstance(audio_path, str):
+            results["audio_path"] = audio_path
+        return results
         
     except Exception as e:
         return {"error": str(e)}
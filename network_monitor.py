@@ -0,0 +1,424 @@
+import bisect
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+# Low-overhead continuous network monitor: small periodic probes against an
+# echo target, summarized in fixed-size rolling histograms.
+DEFAULT_INTERVAL_SEC = 0.2
+DEFAULT_PACKET_SIZE = 64
+# Bandwidth budget in bytes (not bits) per second, both directions
+DEFAULT_BUDGET_BYTES_PER_SEC = int(os.environ.get("NETWORK_MONITOR_BUDGET_BYTES_PER_SEC", 2000))
+DEFAULT_TIMEOUT_SEC = 1.0
+DEFAULT_DURATION_SEC = int(os.environ.get("NETWORK_MONITOR_DURATION", 60))
+
+# Per-packet header bytes counted against the budget. A TCP probe also costs
+# one pure ACK in each direction (headers with timestamps option).
+IP_UDP_OVERHEAD = 28
+IP_TCP_OVERHEAD = 52
+
+# Histogram bin upper edges
+RTT_BINS_MS = [1, 2, 3, 5, 7, 10, 15, 20, 30, 40, 50, 70, 100, 150, 200, 300, 500, 700, 1000, 2000]
+JITTER_BINS_MS = [0.5, 1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 100, 200, 500]
+LOSS_BINS_PCT = [0, 1, 2, 5, 10, 20, 50, 100]
+
+# Loss is measured over consecutive blocks of this many probes
+LOSS_BLOCK = 20
+
+_PROBE = struct.Struct("!Id")  # seq, send time
+
+class RollingWindows:
+    """
+    Fixed ring of `windows` time windows of `window_sec` each. A window's
+    slot is reset in place when time moves past it, so memory never grows.
+    """
+    def __init__(self, windows=30, window_sec=10.0):
+        self.window_sec = window_sec
+        self.window_ids = [None] * windows
+        self.values = [self._empty() for _ in range(windows)]
+
+    def _empty(self):
+        raise NotImplementedError
+
+    def _slot(self, now):
+        window_id = int(now // self.window_sec)
+        index = window_id % len(self.values)
+        if self.window_ids[index] != window_id:
+            self.window_ids[index] = window_id
+            self.values[index] = self._empty()
+        return index
+
+    def live(self, now=None):
+        """
+        Returns the values of the windows still inside the rolling span.
+        """
+        now = time.monotonic() if now is None else now
+        current = int(now // self.window_sec)
+        return [value for window_id, value in zip(self.window_ids, self.values)
+                if window_id is not None and current - window_id < len(self.values)]
+
+class RollingHistogram(RollingWindows):
+    """
+    Fixed-memory histogram over the last `windows` windows of `window_sec`.
+    """
+    def __init__(self, bins, windows=30, window_sec=10.0):
+        self.bins = list(bins)
+        super().__init__(windows, window_sec)
+
+    def _empty(self):
+        return [0] * (len(self.bins) + 1)
+
+    def add(self, value, now=None):
+        now = time.monotonic() if now is None else now
+        self.values[self._slot(now)][bisect.bisect_left(self.bins, value)] += 1
+
+    def merged(self, now=None):
+        """
+        Returns the bin counts summed over the live windows.
+        """
+        total = self._empty()
+        for counts in self.live(now):
+            for i, c in enumerate(counts):
+                total[i] += c
+        return total
+
+    def percentile(self, p, now=None):
+        """
+        Approximate p-th percentile (0-100), interpolated within the bin.
+        Returns None when empty.
+        """
+        counts = self.merged(now)
+        n = sum(counts)
+        if n == 0:
+            return None
+        rank = p / 100 * n
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lower = self.bins[i - 1] if i > 0 else 0
+                upper = self.bins[i] if i < len(self.bins) else self.bins[-1]
+                return lower + (upper - lower) * ((rank - seen) / c)
+            seen += c
+        return self.bins[-1]
+
+    def count(self, now=None):
+        return sum(self.merged(now))
+
+class RollingMax(RollingWindows):
+    """
+    Largest value seen per window, over the same rolling span.
+    """
+    def _empty(self):
+        return 0
+
+    def add(self, value, now=None):
+        now = time.monotonic() if now is None else now
+        index = self._slot(now)
+        self.values[index] = max(self.values[index], value)
+
+    def max(self, now=None):
+        return max(self.live(now), default=0)
+
+class EchoServer:
+    """
+    Minimal local UDP/TCP echo server, bundled for tests and local runs.
+    """
+    def __init__(self, host="127.0.0.1", port=0, protocol="udp"):
+        self.protocol = protocol
+        kind = socket.SOCK_DGRAM if protocol == "udp" else socket.SOCK_STREAM
+        self.sock = socket.socket(socket.AF_INET, kind)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        if protocol == "tcp":
+            self.sock.listen()
+        self.address = self.sock.getsockname()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        clients = []
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self.sock] + clients, [], [], 0.1)
+            for s in readable:
+                try:
+                    if self.protocol == "udp":
+                        data, addr = s.recvfrom(65535)
+                        s.sendto(data, addr)
+                    elif s is self.sock:
+                        conn, _ = s.accept()
+                        clients.append(conn)
+                    else:
+                        data = s.recv(65535)
+                        if data:
+                            s.sendall(data)
+                        else:
+                            clients.remove(s)
+                            s.close()
+                except OSError:
+                    if s in clients:
+                        clients.remove(s)
+                        s.close()
+        for conn in clients:
+            conn.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sock.close()
+
+class NetworkMonitor:
+    """
+    Sends small probes to an echo target in a background thread and keeps
+    rolling RTT, jitter and loss statistics. Probe rate is capped so that
+    traffic stays within budget_bytes_per_sec (request + echo + ACKs).
+    All summary percentages and maxima cover the same rolling span of
+    windows * window_sec; only probes_sent is a lifetime counter.
+    """
+    def __init__(self, target, protocol="udp", interval=DEFAULT_INTERVAL_SEC,
+                 packet_size=DEFAULT_PACKET_SIZE, budget_bytes_per_sec=DEFAULT_BUDGET_BYTES_PER_SEC,
+                 timeout=DEFAULT_TIMEOUT_SEC, windows=30, window_sec=10.0):
+        self.target = tuple(target)
+        self.protocol = protocol
+        self.packet_size = max(packet_size, _PROBE.size)
+        self.interval = max(interval, self.probe_cost() / budget_bytes_per_sec)
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.rtt_hist = RollingHistogram(RTT_BINS_MS, windows, window_sec)
+        self.jitter_hist = RollingHistogram(JITTER_BINS_MS, windows, window_sec)
+        self.loss_hist = RollingHistogram(LOSS_BINS_PCT, windows, window_sec)
+        # bin 0: answered, bin 1: lost
+        self.outcomes = RollingHistogram([0], windows, window_sec)
+        self.burst_max = RollingMax(windows, window_sec)
+        self.sent = 0
+        self.loss_burst = 0
+        self.last_rtt = None
+        self.block_sent = 0
+        self.block_lost = 0
+
+        self._outstanding = {}  # seq -> send time, oldest first
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe_cost(self):
+        """
+        Bytes on the wire for one probe round trip.
+        """
+        if self.protocol == "tcp":
+            return 2 * (self.packet_size + IP_TCP_OVERHEAD) + 2 * IP_TCP_OVERHEAD
+        return 2 * (self.packet_size + IP_UDP_OVERHEAD)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _padding(self):
+        return b"\0" * (self.packet_size - _PROBE.size)
+
+    def _open(self):
+        """
+        Returns a connected socket, or None if the target is unreachable.
+        """
+        kind = socket.SOCK_DGRAM if self.protocol == "udp" else socket.SOCK_STREAM
+        sock = socket.socket(socket.AF_INET, kind)
+        try:
+            sock.settimeout(min(self.timeout, self.interval))
+            sock.connect(self.target)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    def _run(self):
+        sock = None
+        try:
+            padding = self._padding()
+            buffer = b""
+            seq = 0
+            next_send = time.monotonic()
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= next_send:
+                    if sock is None:
+                        # (Re)connect; probes sent while down count as lost
+                        sock = self._open()
+                        buffer = b""
+                    with self.lock:
+                        self._outstanding[seq] = now
+                        self.sent += 1
+                    if sock is not None:
+                        try:
+                            # sendall: a partial TCP write would misalign every later echo
+                            sock.sendall(_PROBE.pack(seq, now) + padding)
+                        except OSError:
+                            # Counted as lost once it times out; reconnect on the next probe
+                            sock.close()
+                            sock = None
+                    seq = (seq + 1) & 0xFFFFFFFF
+                    # Reschedule from now: never catch up on probes missed
+                    # during a stall, which would burst past the budget
+                    next_send = max(next_send + self.interval, time.monotonic())
+
+                wait = max(0, next_send - time.monotonic())
+                if sock is not None:
+                    readable = select.select([sock], [], [], wait)[0]
+                else:
+                    time.sleep(wait)
+                    readable = []
+                if readable:
+                    try:
+                        data = sock.recv(65535)
+                    except OSError:
+                        data = b""
+                    if self.protocol == "tcp":
+                        if not data:
+                            # Connection closed: reconnect on the next probe
+                            sock.close()
+                            sock = None
+                        buffer += data
+                        while len(buffer) >= self.packet_size:
+                            self._on_reply(buffer[:_PROBE.size])
+                            buffer = buffer[self.packet_size:]
+                    elif len(data) >= _PROBE.size:
+                        self._on_reply(data[:_PROBE.size])
+                self._expire(time.monotonic())
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _on_reply(self, payload):
+        seq, _ = _PROBE.unpack(payload)
+        now = time.monotonic()
+        with self.lock:
+            sent_at = self._outstanding.pop(seq, None)
+            if sent_at is None:
+                return  # Late reply, already counted as lost
+            rtt = (now - sent_at) * 1000
+            self.outcomes.add(0, now)
+            self.rtt_hist.add(rtt, now)
+            if self.last_rtt is not None:
+                # Inter-packet delay variation (RFC 3550 style)
+                self.jitter_hist.add(abs(rtt - self.last_rtt), now)
+            self.last_rtt = rtt
+            self.loss_burst = 0
+            self._count_block(False, now)
+
+    def _expire(self, now):
+        with self.lock:
+            while self._outstanding:
+                seq, sent_at = next(iter(self._outstanding.items()))
+                if now - sent_at < self.timeout:
+                    break
+                del self._outstanding[seq]
+                self.outcomes.add(1, now)
+                self.loss_burst += 1
+                self.burst_max.add(self.loss_burst, now)
+                self._count_block(True, now)
+
+    def _count_block(self, lost, now):
+        self.block_sent += 1
+        self.block_lost += lost
+        if self.block_sent >= LOSS_BLOCK:
+            self.loss_hist.add(100 * self.block_lost / self.block_sent, now)
+            self.block_sent = 0
+            self.block_lost = 0
+
+    def summary(self):
+        """
+        Returns percentile summaries in the format analyze_network_results rates.
+        A target that never answers yields loss_pct 100 with no RTT figures.
+        """
+        now = time.monotonic()
+        with self.lock:
+            received, lost = self.outcomes.merged(now)
+            answered = received + lost
+            if answered == 0:
+                return {"error": "No probes completed yet"}
+            return {
+                "ping_ms": self.rtt_hist.percentile(50, now),
+                "rtt_p50_ms": self.rtt_hist.percentile(50, now),
+                "rtt_p95_ms": self.rtt_hist.percentile(95, now),
+                "rtt_p99_ms": self.rtt_hist.percentile(99, now),
+                "jitter_p50_ms": self.jitter_hist.percentile(50, now),
+                "jitter_p95_ms": self.jitter_hist.percentile(95, now),
+                "loss_pct": 100 * lost / answered,
+                "loss_p95_pct": self.loss_hist.percentile(95, now) or 0.0,
+                "max_loss_burst": self.burst_max.max(now),
+                "probes_answered": received,
+                "probes_lost": lost,
+                "probes_sent": self.sent,
+                "probe_interval_ms": self.interval * 1000,
+                "window_span_sec": len(self.outcomes.values) * self.outcomes.window_sec,
+            }
+
+def parse_target(value):
+    """
+    Parses "host:port" into a (host, port) tuple.
+    """
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected host:port, got {value!r}")
+    return host, int(port)
+
+def monitor_network_quality(target, duration=DEFAULT_DURATION_SEC, **kwargs):
+    """
+    Monitors the connection to an echo target for `duration` seconds.
+    target is a (host, port) tuple or a "host:port" string.
+    """
+    if isinstance(target, str):
+        target = parse_target(target)
+    monitor = NetworkMonitor(target, **kwargs).start()
+    try:
+        time.sleep(duration)
+    finally:
+        monitor.stop()
+    return monitor.summary()
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Continuous jitter/loss monitor against a UDP/TCP echo target.")
+    parser.add_argument("target", nargs="?", default=os.environ.get("NETWORK_MONITOR_TARGET"),
+                        help="echo target host:port (default: $NETWORK_MONITOR_TARGET)")
+    parser.add_argument("--local", action="store_true", help="probe a bundled local echo server instead")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SEC, help="seconds to monitor")
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_SEC, help="seconds between probes")
+    parser.add_argument("--budget-bytes", type=int, default=DEFAULT_BUDGET_BYTES_PER_SEC,
+                        help="bandwidth budget in bytes/sec (default: $NETWORK_MONITOR_BUDGET_BYTES_PER_SEC)")
+    args = parser.parse_args(argv)
+
+    if not args.local and not args.target:
+        parser.error("a target (or --local) is required")
+
+    server = EchoServer(protocol=args.protocol).start() if args.local else None
+    try:
+        target = server.address if server else args.target
+        results = monitor_network_quality(target, duration=args.duration, protocol=args.protocol,
+                                          interval=args.interval, budget_bytes_per_sec=args.budget_bytes)
+    finally:
+        if server:
+            server.stop()
+
+    from report import analyze_network_results
+    rating, recs = analyze_network_results(results)
+    print(results)
+    print(rating, recs)
+
+if __name__ == "__main__":
+    main()
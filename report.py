@@ -126,8 +126,13 @@ def analyze_network_results(results):
     
     recommendations = []
     
+    # Continuous monitor results (network_monitor.py) have no bandwidth figures
+    probe_only = "loss_pct" in results and "download_mbps" not in results
+    
     # Zoom HD requirements: 3.0 Mbps up/down
-    if up < 1.0 or down < 1.0:
+    if probe_only:
+        rating = "Excellent"
+    elif up < 1.0 or down < 1.0:
         recommendations.append("Internet speed is very slow. Video may freeze.")
         rating = "Poor"
     elif up < 3.0 or down < 3.0:
@@ -136,8 +141,24 @@ def analyze_network_results(results):
     else:
         rating = "Excellent"
         
-    if ping > 100:
+    if ping is not None and ping > 100:
         recommendations.append("High latency detected. There may be delays in conversation.")
         if rating != "Poor": rating = "Fair"
         
+    # Jitter: calls degrade noticeably above ~30ms
+    jitter = results.get("jitter_p95_ms")
+    if jitter is not None and jitter > 30:
+        recommendations.append("High jitter detected. Audio may sound choppy; prefer a wired connection.")
+        if rating != "Poor": rating = "Fair"
+        
+    # Packet loss
+    loss = results.get("loss_pct")
+    if loss is not None:
+        if loss > 5:
+            recommendations.append("Heavy packet loss detected. Video and audio will break up.")
+            rating = "Poor"
+        elif loss > 1 or results.get("loss_p95_pct", 0) > 5:
+            recommendations.append("Some packet loss detected, possibly in bursts. Check Wi-Fi signal or other traffic.")
+            if rating != "Poor": rating = "Fair"
+        
     return rating, recommendations
@@ -0,0 +1,150 @@
+import multiprocessing as mp
+import os
+
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache, cached_analysis
+
+def stub_analyze(path, gain=1.0):
+    with open(path, "rb") as f:
+        data = f.read()
+    return {"decibels": -40.0 * gain, "size": len(data), "audio_path": path}
+
+class CountingAnalyzer:
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self, path, **params):
+        self.calls += 1
+        if self.result is not None:
+            return dict(self.result)
+        return stub_analyze(path, **params)
+
+def write(path, data=b"media"):
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(str(tmp_path / "cache.sqlite3"))
+
+def entry(i):
+    # Each entry serializes to the same number of bytes
+    return {"v": f"{i:04d}"}
+
+def test_hit_skips_analyzer(cache, tmp_path):
+    media = write(tmp_path / "a.wav")
+    analyze = CountingAnalyzer()
+    first = cached_analysis(cache, media, "audio", 1, analyze)
+    second = cached_analysis(cache, media, "audio", 1, analyze)
+    assert first == second
+    assert analyze.calls == 1
+
+def test_version_and_params_change_key(cache, tmp_path):
+    media = write(tmp_path / "a.wav")
+    analyze = CountingAnalyzer()
+    cached_analysis(cache, media, "audio", 1, analyze)
+    cached_analysis(cache, media, "audio", 2, analyze)
+    cached_analysis(cache, media, "audio", 2, analyze, params={"gain": 2.0})
+    assert analyze.calls == 3
+
+def test_lru_eviction_respects_get_touch(tmp_path):
+    size = len('{"v": "0000"}')
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), max_bytes=3 * size)
+    for key in "abc":
+        cache.put(key, entry(0))
+    assert cache.get("a") is not None
+    cache.put("d", entry(0))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get("d") is not None
+
+def test_max_bytes_bound(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), max_bytes=200)
+    for i in range(100):
+        cache.put(str(i), entry(i))
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 200
+    assert stats["evictions"] == 100 - stats["entries"]
+    # Most recent entry survives
+    assert cache.get("99") == entry(99)
+
+def test_oversized_entry_not_stored(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    cache.put("big", {"v": "x" * 100})
+    assert cache.get("big") is None
+
+def test_errors_not_cached(cache, tmp_path):
+    media = write(tmp_path / "a.wav")
+    analyze = CountingAnalyzer(result={"error": "Could not read WAV file"})
+    for _ in range(2):
+        assert "error" in cached_analysis(cache, media, "audio", 1, analyze)
+    assert analyze.calls == 2
+    assert cache.stats()["entries"] == 0
+
+def test_missing_file_returns_error(cache, tmp_path):
+    analyze = CountingAnalyzer()
+    result = cached_analysis(cache, str(tmp_path / "missing.wav"), "audio", 1, analyze)
+    assert "error" in result
+    assert analyze.calls == 0
+    assert cache.stats()["entries"] == 0
+
+def test_path_field_follows_current_file(cache, tmp_path):
+    first = write(tmp_path / "first.wav", b"same bytes")
+    second = write(tmp_path / "second.wav", b"same bytes")
+    analyze = CountingAnalyzer()
+
+    a = cached_analysis(cache, first, "audio", 1, analyze, path_field="audio_path")
+    os.remove(first)
+    b = cached_analysis(cache, second, "audio", 1, analyze, path_field="audio_path")
+
+    assert analyze.calls == 1
+    assert a["audio_path"] == first
+    assert b["audio_path"] == second
+    assert {k: v for k, v in a.items() if k != "audio_path"} == {k: v for k, v in b.items() if k != "audio_path"}
+
+def test_stats_hit_rate(cache, tmp_path):
+    media = write(tmp_path / "a.wav")
+    analyze = CountingAnalyzer()
+    for _ in range(4):
+        cached_analysis(cache, media, "audio", 1, analyze)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == pytest.approx(0.75)
+    assert stats["entries"] == 1
+    assert stats["file_bytes"] > 0
+
+def test_default_cache_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_cache, "DEFAULT_CACHE_PATH", str(tmp_path / "default.sqlite3"))
+    monkeypatch.setattr(analysis_cache, "_default_cache", None)
+    cache = analysis_cache.get_default_cache()
+    assert cache is analysis_cache.get_default_cache()
+    assert cache.path == str(tmp_path / "default.sqlite3")
+
+def _worker(args):
+    db_path, media_paths = args
+    cache = AnalysisCache(db_path, flush_interval=0)
+    results = [cached_analysis(cache, path, "audio", 1, stub_analyze, path_field="audio_path")
+               for path in media_paths]
+    cache.flush()
+    return results
+
+def test_concurrent_processes(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    media = [write(tmp_path / f"{i}.wav", bytes([i]) * (i + 1)) for i in range(5)]
+    AnalysisCache(db_path)
+
+    with mp.get_context("spawn").Pool(4) as pool:
+        results = pool.map(_worker, [(db_path, media)] * 8)
+
+    for per_process in results:
+        assert [r["audio_path"] for r in per_process] == media
+        assert [r["size"] for r in per_process] == [i + 1 for i in range(5)]
+    stats = AnalysisCache(db_path).stats()
+    assert stats["entries"] == 5
+    # Every lookup is counted, whichever process made it
+    assert stats["hits"] + stats["misses"] == 40
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("av")
+
+from audio_check import PlaybackStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_store(ttl=10):
+    clock = FakeClock()
+    return PlaybackStore(ttl=ttl, sweep_interval=None, clock=clock), clock
+
+def test_get_before_expiry():
+    store, clock = make_store()
+    key = store.put(b"clip", "audio/ogg")
+    clock.now += 9
+    assert store.get(key) == (b"clip", "audio/ogg")
+
+def test_entries_expire_after_ttl():
+    store, clock = make_store()
+    key = store.put(b"clip", "audio/ogg")
+    clock.now += 10
+    assert store.get(key) == (None, None)
+    assert store.entries == {}
+
+def test_sweep_drops_expired_entries_of_other_sessions():
+    store, clock = make_store()
+    old = store.put(b"old", "audio/ogg")
+    clock.now += 6
+    new = store.put(b"new", "audio/ogg")
+    clock.now += 5
+    store.sweep()
+    assert old not in store.entries
+    assert new in store.entries
+
+def test_put_sweeps_expired_entries():
+    store, clock = make_store()
+    for _ in range(5):
+        store.put(b"x" * 100, "audio/ogg")
+    clock.now += 20
+    store.put(b"y", "audio/ogg")
+    assert len(store.entries) == 1
+
+def test_discard():
+    store, _ = make_store()
+    key = store.put(b"clip", "audio/ogg")
+    store.discard(key)
+    store.discard(key)
+    store.discard(None)
+    assert store.get(key) == (None, None)
+
+def test_background_sweeper():
+    import time
+
+    store = PlaybackStore(ttl=0.05, sweep_interval=0.02)
+    store.put(b"clip", "audio/ogg")
+    time.sleep(0.3)
+    assert store.entries == {}
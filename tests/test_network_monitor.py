@@ -0,0 +1,169 @@
+import socket
+import time
+
+import pytest
+
+from network_monitor import (
+    EchoServer, NetworkMonitor, RollingHistogram, RollingMax,
+    IP_TCP_OVERHEAD, IP_UDP_OVERHEAD, parse_target,
+)
+from report import analyze_network_results
+
+def run_monitor(target, seconds, **kwargs):
+    monitor = NetworkMonitor(target, **kwargs).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        monitor.stop()
+    return monitor.summary()
+
+def dead_udp_target():
+    # Bind then close: nothing listens on this port anymore
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+@pytest.mark.parametrize("protocol", ["udp", "tcp"])
+def test_echo_summary(protocol):
+    server = EchoServer(protocol=protocol).start()
+    try:
+        summary = run_monitor(server.address, 1.0, protocol=protocol, interval=0.02,
+                              budget_bytes_per_sec=1_000_000, timeout=0.5)
+    finally:
+        server.stop()
+
+    assert summary["loss_pct"] == 0
+    assert summary["max_loss_burst"] == 0
+    assert summary["probes_answered"] > 10
+    assert summary["probes_lost"] == 0
+    assert 0 < summary["rtt_p50_ms"] <= summary["rtt_p95_ms"] <= summary["rtt_p99_ms"]
+    assert summary["jitter_p95_ms"] is not None
+    assert summary["ping_ms"] == summary["rtt_p50_ms"]
+    assert analyze_network_results(summary)[0] == "Excellent"
+
+@pytest.mark.parametrize("protocol, overhead, acks", [("udp", IP_UDP_OVERHEAD, 0), ("tcp", IP_TCP_OVERHEAD, 2)])
+def test_budget_limits_probe_interval(protocol, overhead, acks):
+    monitor = NetworkMonitor(("127.0.0.1", 9), protocol=protocol, interval=0.01,
+                             packet_size=100, budget_bytes_per_sec=1000)
+    cost = 2 * (100 + overhead) + acks * overhead
+    assert monitor.probe_cost() == cost
+    assert monitor.interval == pytest.approx(cost / 1000)
+
+    server = EchoServer(protocol=protocol).start()
+    try:
+        summary = run_monitor(server.address, 0.1, protocol=protocol, interval=0.01,
+                              packet_size=100, budget_bytes_per_sec=1000)
+    finally:
+        server.stop()
+    assert summary["probe_interval_ms"] == pytest.approx(cost)
+
+def test_requested_interval_kept_within_budget():
+    monitor = NetworkMonitor(("127.0.0.1", 9), interval=0.5, budget_bytes_per_sec=1_000_000)
+    assert monitor.interval == 0.5
+
+@pytest.mark.parametrize("protocol", ["udp", "tcp"])
+def test_dead_target_counts_loss_and_bursts(protocol):
+    summary = run_monitor(dead_udp_target(), 1.0, protocol=protocol, interval=0.05,
+                          budget_bytes_per_sec=1_000_000, timeout=0.2)
+
+    assert summary["probes_answered"] == 0
+    assert summary["probes_lost"] >= 10
+    assert summary["loss_pct"] == 100
+    assert summary["max_loss_burst"] == summary["probes_lost"]
+    assert summary["rtt_p50_ms"] is None
+    rating, recs = analyze_network_results(summary)
+    assert rating == "Poor"
+
+def test_loss_burst_after_target_stops():
+    server = EchoServer().start()
+    monitor = NetworkMonitor(server.address, interval=0.02, budget_bytes_per_sec=1_000_000, timeout=0.2).start()
+    try:
+        time.sleep(0.5)
+        server.stop()
+        time.sleep(0.6)
+    finally:
+        monitor.stop()
+    summary = monitor.summary()
+
+    assert summary["probes_answered"] > 0
+    assert 0 < summary["loss_pct"] < 100
+    assert summary["max_loss_burst"] == summary["probes_lost"]
+
+def test_histogram_percentiles():
+    hist = RollingHistogram([10, 20, 30], windows=3, window_sec=10)
+    for value in [5] * 50 + [15] * 40 + [25] * 10:
+        hist.add(value, now=0)
+
+    assert hist.count(now=0) == 100
+    assert hist.merged(now=0) == [50, 40, 10, 0]
+    # Linear interpolation inside the bin holding the rank
+    assert hist.percentile(50, now=0) == pytest.approx(10)
+    assert hist.percentile(70, now=0) == pytest.approx(15)
+    assert hist.percentile(95, now=0) == pytest.approx(25)
+    assert hist.percentile(25, now=0) == pytest.approx(5)
+
+def test_histogram_overflow_bin_and_empty():
+    hist = RollingHistogram([10, 20], windows=2, window_sec=10)
+    assert hist.percentile(50, now=0) is None
+    hist.add(1000, now=0)
+    assert hist.merged(now=0) == [0, 0, 1]
+    assert hist.percentile(99, now=0) == 20
+
+def test_histogram_window_expiry():
+    hist = RollingHistogram([10], windows=3, window_sec=10)
+    hist.add(5, now=0)
+    hist.add(50, now=15)
+
+    assert hist.merged(now=29) == [1, 1]
+    # Window 0 drops out once three newer windows have started
+    assert hist.merged(now=30) == [0, 1]
+    assert hist.merged(now=45) == [0, 0]
+
+    # Slots are reused in place: memory stays fixed
+    hist.add(5, now=100)
+    assert len(hist.values) == 3
+    assert hist.merged(now=100) == [1, 0]
+
+def test_rolling_max_expiry():
+    burst = RollingMax(windows=2, window_sec=10)
+    burst.add(7, now=0)
+    burst.add(3, now=12)
+    assert burst.max(now=12) == 7
+    assert burst.max(now=20) == 3
+    assert burst.max(now=40) == 0
+
+def test_parse_target():
+    assert parse_target("example.com:7") == ("example.com", 7)
+    with pytest.raises(ValueError):
+        parse_target("example.com")
+
+class StallingMonitor(NetworkMonitor):
+    """
+    Blocks the probe loop once, as a slow scheduler or GC pause would.
+    """
+    stall = 0.5
+
+    def _expire(self, now):
+        if self.sent == 3 and self.stall:
+            time.sleep(self.stall)
+            self.stall = 0
+        super()._expire(now)
+
+def test_stall_does_not_burst_probes():
+    server = EchoServer().start()
+    monitor = StallingMonitor(server.address, interval=0.05, budget_bytes_per_sec=1_000_000, timeout=0.5)
+    try:
+        start = time.monotonic()
+        monitor.start()
+        time.sleep(1.0)
+        monitor.stop()
+        elapsed = time.monotonic() - start
+    finally:
+        server.stop()
+
+    # Probes missed during the stall are not sent afterwards
+    sendable = (elapsed - StallingMonitor.stall) / monitor.interval
+    assert monitor.sent <= sendable + 3
+    assert monitor.summary()["loss_pct"] == 0
@@ -0,0 +1,92 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("av")
+
+from video_check import encode_thumbnail
+
+def frame(width, height):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def test_thumbnail_is_downscaled_jpeg():
+    data = encode_thumbnail(frame(640, 480), max_width=320)
+    assert isinstance(data, bytes)
+    assert data[:3] == b"\xff\xd8\xff"
+    assert decode(data).shape == (240, 320, 3)
+    # Far smaller than the raw 640x480 RGB frame
+    assert len(data) < 640 * 480 * 3 // 4
+
+def test_thumbnail_keeps_small_frames():
+    data = encode_thumbnail(frame(200, 100), max_width=320)
+    assert decode(data).shape == (100, 200, 3)
+
+def test_thumbnail_webp():
+    data = encode_thumbnail(frame(640, 480), max_width=160, fmt=".webp")
+    assert data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+    assert decode(data).shape == (120, 160, 3)
+
+def test_quality_bounds_size():
+    img = frame(640, 480)
+    assert len(encode_thumbnail(img, quality=30)) < len(encode_thumbnail(img, quality=95))
+
+from video_check import VideoProcessor
+
+def metrics(brightness, face=None):
+    return {
+        "brightness": brightness,
+        "sharpness": 100.0,
+        "face": face,
+        "headroom": 10.0 if face else None,
+        "face_prop": 0.3 if face else None,
+        "face_brightness": 90.0 if face else None,
+    }
+
+def test_apply_result_records_in_submission_order():
+    processor = VideoProcessor()
+    processor.apply_result(2, metrics(30.0, face=(1, 2, 3, 4)))
+    processor.apply_result(1, metrics(20.0))
+    # Nothing applied until seq 0 arrives
+    assert processor.brightness_values == []
+    assert processor.pending_results.keys() == {1, 2}
+
+    processor.apply_result(0, metrics(10.0))
+    assert processor.brightness_values == [10.0, 20.0, 30.0]
+    assert processor.pending_results == {}
+    assert processor.next_result_seq == 3
+    assert processor.latest_face == (1, 2, 3, 4)
+    assert processor.face_detected
+
+def test_apply_result_skips_empty_results():
+    processor = VideoProcessor()
+    processor.apply_result(1, metrics(20.0))
+    # Timed-out / failed task: the seq is consumed without recording
+    processor.apply_result(0, None)
+    assert processor.brightness_values == [20.0]
+    assert processor.next_result_seq == 2
+    assert processor.latest_face is None
+
+class FullPool:
+    """
+    Stands in for FrameAnalysisPool: frames never fit, so they are analyzed inline.
+    """
+    def register(self, owner):
+        return 0
+
+    def fits(self, gray):
+        return False
+
+def test_inline_frames_wait_for_pooled_frames():
+    processor = VideoProcessor(pool=FullPool())
+    # seq 0 is still running in the pool
+    processor.next_submit_seq = 1
+    processor.submit(np.zeros((1400, 640, 3), dtype=np.uint8))
+    assert processor.brightness_values == []
+    assert processor.next_submit_seq == 2
+
+    processor.apply_result(0, metrics(50.0))
+    assert processor.brightness_values == [50.0, 0.0]
@@ -4,8 +4,103 @@ import numpy as np
 import av
 import threading
 
+# Captured frame is kept as an encoded thumbnail so session results stay small.
+THUMBNAIL_MAX_WIDTH = 320
+THUMBNAIL_FORMAT = ".jpg"  # or ".webp"
+THUMBNAIL_QUALITY = 80
+
+def encode_thumbnail(img, max_width=THUMBNAIL_MAX_WIDTH, fmt=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+    """
+    Downscales a BGR frame and encodes it to JPEG/WebP bytes.
+    """
+    height, width = img.shape[:2]
+    if width > max_width:
+        scale = max_width / width
+        img = cv2.resize(img, (max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+        
+    if fmt == ".webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        
+    ok, buf = cv2.imencode(fmt, img, params)
+    if not ok:
+        return None
+    return buf.tobytes()
+
+# Bump when the metric computation changes (invalidates cached analyses)
+ANALYZER_VERSION = 1
+
+MAX_ANALYSIS_WIDTH = 640
+
+def load_face_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+def resize_for_analysis(img, max_width=MAX_ANALYSIS_WIDTH):
+    """
+    Downscales a frame to max_width for consistent (and cheaper) analysis.
+    """
+    height, width = img.shape[:2]
+    if width > max_width:
+        scale = max_width / width
+        new_height = int(height * scale)
+        img = cv2.resize(img, (max_width, new_height))
+    return img
+
+def analyze_gray(gray, face_cascade):
+    """
+    Computes per-frame metrics on a grayscale frame.
+    Returns a dict of plain floats; face-related keys are None without a face.
+    """
+    # 1. Global Metrics
+    metrics = {
+        "brightness": float(np.mean(gray)),
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "face": None,
+        "headroom": None,
+        "face_prop": None,
+        "face_brightness": None,
+    }
+    
+    # 2. Face Detection
+    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    for (x, y, w, h) in faces:
+        h_frame = gray.shape[0]
+        metrics["face"] = (int(x), int(y), int(w), int(h))
+        
+        # Headroom & Face Prop Analysis
+        metrics["headroom"] = (y / h_frame) * 100
+        metrics["face_prop"] = h / h_frame
+        
+        # Face Brightness
+        metrics["face_brightness"] = float(np.mean(gray[y:y+h, x:x+w]))
+        break # Process only largest face
+        
+    return metrics
+
+def draw_overlay(img, face):
+    """
+    Draws the face box (if any) and the framing guide onto img in place.
+    """
+    if face is not None:
+        x, y, w, h = face
+        cv2.rectangle(img, (x, y), (x+w, y+h), (255, 0, 0), 2)
+        
+    # Draw Guide (Ellipse)
+    h, w = img.shape[:2]
+    center_x = w // 2
+    center_y = int(h * 0.45)
+    axes = (int(h * 0.25), int(h * 0.35))
+    cv2.ellipse(img, (center_x, center_y), axes, 0, 0, 360, (0, 255, 255), 2)
+    return img
+
 class VideoProcessor:
-    def __init__(self):
+    def __init__(self, pool=None):
+        """
+        pool: optional video_workers.FrameAnalysisPool. When given, recv()
+        only hands the gray frame to the pool and draws the overlay from
+        the latest completed result.
+        """
         self.frame_lock = threading.Lock()
         self.brightness_values = []
         self.sharpness_values = []
@@ -17,91 +112,151 @@ class VideoProcessor:
         self.last_frame = None
         
         # Load Haar Cascade
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-    def recv(self, frame):
-        img = frame.to_ndarray(format="bgr24")
-        
-        # Resize for consistent analysis (optional, but good for performance)
-        height, width = img.shape[:2]
-        max_width = 640
-        if width > max_width:
-            scale = max_width / width
-            new_height = int(height * scale)
-            img = cv2.resize(img, (max_width, new_height))
-            
-        # Analysis
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 1. Global Metrics
-        brightness = np.mean(gray)
-        sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+        self.face_cascade = load_face_cascade()
         
+        # Pool mode: results are applied in submission order
+        self.pool = pool
+        self.result_lock = threading.Lock()
+        self.pending_results = {}
+        self.next_submit_seq = 0
+        self.next_result_seq = 0
+        self.latest_face = None
+        self.owner_id = pool.register(self) if pool is not None else None
+
+    def record(self, metrics, frame=None):
+        """
+        Accumulates the metrics of one analyzed frame.
+        """
         with self.frame_lock:
-            self.brightness_values.append(brightness)
-            self.sharpness_values.append(sharpness)
+            self.brightness_values.append(metrics["brightness"])
+            self.sharpness_values.append(metrics["sharpness"])
             self.frame_count += 1
+            if frame is not None:
+                self.last_frame = frame
+            if metrics["face"] is not None:
+                self.headroom_values.append(metrics["headroom"])
+                self.face_prop_values.append(metrics["face_prop"])
+                self.face_brightness_values.append(metrics["face_brightness"])
+                self.face_detected = True
+
+    def process(self, img):
+        """
+        Analyzes a (resized) BGR frame, records its metrics and returns it
+        with the overlay drawn.
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        metrics = analyze_gray(gray, self.face_cascade)
+        self.record(metrics, frame=img.copy())
+        return draw_overlay(img, metrics["face"])
+
+    def submit(self, img):
+        """
+        Pool mode: queues the frame for analysis and returns it with the
+        overlay of the latest completed result.
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        seq = self.next_submit_seq
+        if not self.pool.fits(gray):
+            # Too tall for a slot: analyze here rather than drop it, but
+            # still apply the result in order behind the pooled frames
+            self.next_submit_seq += 1
+            self.apply_result(seq, analyze_gray(gray, self.face_cascade))
+        elif self.pool.submit(self.owner_id, seq, gray):
+            self.next_submit_seq += 1
+        with self.frame_lock:
             self.last_frame = img.copy()
+        return draw_overlay(img, self.latest_face)
+
+    def apply_result(self, seq, metrics):
+        """
+        Called by the pool; buffers out-of-order results and records them
+        in submission order.
+        """
+        with self.result_lock:
+            self.pending_results[seq] = metrics
+            while self.next_result_seq in self.pending_results:
+                metrics = self.pending_results.pop(self.next_result_seq)
+                self.next_result_seq += 1
+                if metrics is not None:
+                    self.record(metrics)
+                    self.latest_face = metrics["face"]
+
+    def recv(self, frame):
+        img = frame.to_ndarray(format="bgr24")
         
-        # 2. Face Detection
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-        
-        detected_this_frame = False
-        for (x, y, w, h) in faces:
-            detected_this_frame = True
-            
-            # Draw Face Box
-            cv2.rectangle(img, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            
-            # Headroom & Face Prop Analysis
-            h_frame, w_frame = img.shape[:2]
-            headroom_pct = (y / h_frame) * 100
-            face_prop = h / h_frame
-            
-            # Face Brightness
-            face_roi = gray[y:y+h, x:x+w]
-            face_brightness = np.mean(face_roi)
-            
-            with self.frame_lock:
-                self.headroom_values.append(headroom_pct)
-                self.face_prop_values.append(face_prop)
-                self.face_brightness_values.append(face_brightness)
-                self.face_detected = True
-                
-            break # Process only largest face
-            
-        # Draw Guide (Ellipse)
-        h, w = img.shape[:2]
-        center_x = w // 2
-        center_y = int(h * 0.45)
-        axes = (int(h * 0.25), int(h * 0.35))
-        cv2.ellipse(img, (center_x, center_y), axes, 0, 0, 360, (0, 255, 255), 2)
+        # Resize for consistent analysis (optional, but good for performance)
+        img = resize_for_analysis(img)
+        if self.pool is not None:
+            img = self.submit(img)
+        else:
+            img = self.process(img)
         
         return av.VideoFrame.from_ndarray(img, format="bgr24")
 
-    def get_stats(self):
+    def on_ended(self):
+        if self.pool is not None:
+            self.pool.unregister(self.owner_id)
+
+    def get_stats(self, thumbnail_width=THUMBNAIL_MAX_WIDTH, thumbnail_format=THUMBNAIL_FORMAT):
+        """
+        Returns averaged metrics as plain floats plus an encoded thumbnail
+        of the last frame (bytes), suitable for keeping in session state.
+        """
         with self.frame_lock:
             if not self.brightness_values:
                 return None
                 
-            avg_brightness = np.mean(self.brightness_values)
-            avg_sharpness = np.mean(self.sharpness_values)
-            avg_face_brightness = np.mean(self.face_brightness_values) if self.face_brightness_values else None
-            avg_headroom = np.mean(self.headroom_values) if self.headroom_values else None
-            avg_face_prop = np.mean(self.face_prop_values) if self.face_prop_values else None
+            avg_brightness = float(np.mean(self.brightness_values))
+            avg_sharpness = float(np.mean(self.sharpness_values))
+            avg_face_brightness = float(np.mean(self.face_brightness_values)) if self.face_brightness_values else None
+            avg_headroom = float(np.mean(self.headroom_values)) if self.headroom_values else None
+            avg_face_prop = float(np.mean(self.face_prop_values)) if self.face_prop_values else None
+            frame_count = self.frame_count
+            face_detected = bool(self.face_detected)
+            last_frame = self.last_frame
             
-            # Convert last frame to RGB for display
-            last_frame_rgb = None
-            if self.last_frame is not None:
-                last_frame_rgb = cv2.cvtColor(self.last_frame, cv2.COLOR_BGR2RGB)
-
-            return {
-                "avg_brightness": avg_brightness,
-                "avg_sharpness": avg_sharpness,
-                "frames_captured": self.frame_count,
-                "face_detected": self.face_detected,
-                "avg_face_brightness": avg_face_brightness,
-                "avg_headroom": avg_headroom,
-                "avg_face_prop": avg_face_prop,
-                "last_frame": last_frame_rgb
-            }
+        # Encode outside the lock so recv() is not blocked
+        thumbnail = None
+        if last_frame is not None:
+            thumbnail = encode_thumbnail(last_frame, max_width=thumbnail_width, fmt=thumbnail_format)
+
+        return {
+            "avg_brightness": avg_brightness,
+            "avg_sharpness": avg_sharpness,
+            "frames_captured": frame_count,
+            "face_detected": face_detected,
+            "avg_face_brightness": avg_face_brightness,
+            "avg_headroom": avg_headroom,
+            "avg_face_prop": avg_face_prop,
+            "thumbnail": thumbnail
+        }
+
+def analyze_video_file(video_path, max_frames=300, frame_step=1):
+    """
+    Analyzes a video file with the same per-frame metrics as the live check.
+    Returns the averaged metrics (without thumbnail) or an error dict.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {"error": f"Could not open video file: {video_path}"}
+        
+    processor = VideoProcessor()
+    try:
+        index = 0
+        while processor.frame_count < max_frames:
+            ok, img = cap.read()
+            if not ok:
+                break
+            if index % frame_step == 0:
+                img = resize_for_analysis(img)
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                processor.record(analyze_gray(gray, processor.face_cascade))
+            index += 1
+    finally:
+        cap.release()
+        
+    stats = processor.get_stats()
+    if stats is None:
+        return {"error": "No frames decoded"}
+    stats.pop("thumbnail", None)
+    return stats
@@ -0,0 +1,201 @@
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from video_check import MAX_ANALYSIS_WIDTH, analyze_gray, load_face_cascade
+
+# Pool of worker processes that run the per-frame analysis off the aiortc
+# thread. Gray frames are handed over through fixed-size shared-memory slots;
+# only small (task_id, slot, shape) tuples go through the queues.
+DEFAULT_WORKERS = int(os.environ.get("VIDEO_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+# A slot holds one downscaled gray frame. resize_for_analysis only bounds the
+# width, so leave room for portrait frames down to a 1:2 aspect ratio; taller
+# frames are analyzed inline by the caller.
+MAX_SLOT_HEIGHT = 2 * MAX_ANALYSIS_WIDTH
+SLOT_SIZE = MAX_ANALYSIS_WIDTH * MAX_SLOT_HEIGHT
+
+# A task without a reply after this long is given up (e.g. its worker died):
+# the slot is reclaimed and the owner gets an empty result for that seq.
+TASK_TIMEOUT_SEC = float(os.environ.get("VIDEO_TASK_TIMEOUT_SEC", 5.0))
+
+def _worker_main(shm_name, slot_size, tasks, results):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    face_cascade = load_face_cascade()
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, shape = task
+            gray = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_size)
+            try:
+                metrics = analyze_gray(gray, face_cascade)
+            except Exception:
+                # Still answer so the owner's in-order delivery does not stall
+                metrics = None
+            del gray
+            results.put((task_id, metrics))
+    finally:
+        shm.close()
+
+class FrameAnalysisPool:
+    """
+    Shared pool of analysis processes used by VideoProcessor in pool mode.
+    submit() never blocks: when all slots are busy the frame is skipped.
+    """
+    def __init__(self, processes=DEFAULT_WORKERS, slots=None, task_timeout=TASK_TIMEOUT_SEC):
+        self.processes = processes
+        self.slots = slots or processes * 2
+        self.slot_size = SLOT_SIZE
+        self.task_timeout = task_timeout
+
+        # Spawn: forking a threaded server process is not safe
+        self._ctx = ctx = mp.get_context("spawn")
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_size)
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._free_slots = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+
+        self._owners = weakref.WeakValueDictionary()
+        self._owner_ids = itertools.count()
+
+        # task_id -> (owner_id, seq, slot, submitted_at)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._task_ids = itertools.count()
+
+        self._closed = False
+        self._workers = [self._start_worker() for _ in range(processes)]
+
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _start_worker(self):
+        worker = self._ctx.Process(
+            target=_worker_main, args=(self._shm.name, self.slot_size, self._tasks, self._results), daemon=True
+        )
+        worker.start()
+        return worker
+
+    def register(self, owner):
+        """
+        Registers an object with apply_result(seq, metrics); returns its id.
+        """
+        owner_id = next(self._owner_ids)
+        self._owners[owner_id] = owner
+        return owner_id
+
+    def unregister(self, owner_id):
+        self._owners.pop(owner_id, None)
+
+    def fits(self, gray):
+        return gray.nbytes <= self.slot_size
+
+    def submit(self, owner_id, seq, gray):
+        """
+        Copies a uint8 gray frame into a free slot and queues it.
+        Returns False (frame skipped) if the pool is closed or no slot is
+        free; frames that do not fit() must be analyzed by the caller.
+        """
+        if self._closed or not self.fits(gray):
+            return False
+        try:
+            slot = self._free_slots.get_nowait()
+        except queue.Empty:
+            return False
+
+        view = np.ndarray(gray.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_size)
+        view[...] = gray
+        del view
+        task_id = next(self._task_ids)
+        with self._inflight_lock:
+            self._inflight[task_id] = (owner_id, seq, slot, time.monotonic())
+        self._tasks.put((task_id, slot, gray.shape))
+        return True
+
+    def _deliver(self, task_id, metrics):
+        with self._inflight_lock:
+            task = self._inflight.pop(task_id, None)
+        if task is None:
+            return  # Already timed out; its slot was reclaimed
+        owner_id, seq, slot, _ = task
+        self._free_slots.put(slot)
+        owner = self._owners.get(owner_id)
+        if owner is not None:
+            owner.apply_result(seq, metrics)
+
+    def _reap(self):
+        """
+        Replaces dead workers and gives up on tasks past task_timeout, so
+        slots are reclaimed and owners' in-order delivery keeps moving.
+        """
+        if self._closed:
+            return
+        for i, worker in enumerate(self._workers):
+            if not worker.is_alive():
+                self._workers[i] = self._start_worker()
+        now = time.monotonic()
+        with self._inflight_lock:
+            expired = [task_id for task_id, (_, _, _, submitted_at) in self._inflight.items()
+                       if now - submitted_at > self.task_timeout]
+        for task_id in expired:
+            self._deliver(task_id, None)
+
+    def _dispatch(self):
+        while True:
+            try:
+                item = self._results.get(timeout=min(1.0, self.task_timeout))
+            except queue.Empty:
+                self._reap()
+                continue
+            if item is None:
+                break
+            self._deliver(*item)
+            self._reap()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put(None)
+        self._dispatcher.join(timeout=5)
+        self._shm.close()
+        self._shm.unlink()
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_shared_pool(processes=None):
+    """
+    Returns the process-wide pool, creating it on first use with `processes`
+    workers (default VIDEO_WORKERS). Asking for a different size once the
+    pool exists raises ValueError rather than silently ignoring it.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = FrameAnalysisPool(processes=processes or DEFAULT_WORKERS)
+            atexit.register(_shared_pool.close)
+        elif processes is not None and processes != _shared_pool.processes:
+            raise ValueError(
+                f"Shared video pool already running with {_shared_pool.processes} workers, "
+                f"cannot resize to {processes}"
+            )
+        return _shared_pool